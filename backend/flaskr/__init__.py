@@ -1,32 +1,112 @@
 import os
-from flask import Flask, request, abort, jsonify
+from flask import Flask, request, abort, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
+from flask_compress import Compress
+from werkzeug.http import generate_etag
+from sqlalchemy import event, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session, raiseload
+from functools import lru_cache
+import orjson
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category
 
 QUESTIONS_PER_PAGE = 10
 
+# Cache-Control for GET responses that clients may revalidate with an ETag.
+# Questions change through this API, so they are always revalidated.
+CACHE_CONTROL = {
+    '/categories': 'public, max-age=60',
+    '/questions': 'no-cache'
+}
 
-# utility for paginating questions
+# columns of a formatted question, selected directly to skip ORM instances
+QUESTION_COLUMNS = (Question.id, Question.question, Question.answer,
+                    Question.category, Question.difficulty)
+
+
+# utility for serializing a JSON response with orjson
+def json_response(payload):
+
+    return current_app.response_class(
+        orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS),
+        mimetype='application/json')
+
+
+# utility for paginating a question query in the database
 def paginate_questions(request, selection):
 
     page = request.args.get('page', 1, type=int)
     start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
 
-    questions = [question.format() for question in selection]
-    current_questions = questions[start:end]
+    # pages before the first one are always empty
+    if start < 0:
+        return []
+
+    rows = selection.with_entities(*QUESTION_COLUMNS).order_by(
+        Question.id).limit(QUESTIONS_PER_PAGE).offset(start).all()
+    current_questions = [row._asdict() for row in rows]
 
     return current_questions
 
 
+# cached {id: type} mapping of categories, formatted to match front-end
+@lru_cache(maxsize=1)
+def _categories_dict():
+
+    return {id: type for id, type in Category.query.with_entities(
+        Category.id, Category.type).all()}
+
+
+# cached ETag of the categories mapping, so it isn't hashed per request
+@lru_cache(maxsize=1)
+def _categories_etag():
+
+    return generate_etag(orjson.dumps(_categories_dict(),
+                                      option=orjson.OPT_NON_STR_KEYS))
+
+
+# mark the session when a category is flushed, changes aren't visible yet
+def _flag_categories_changed(mapper, connection, target):
+
+    object_session(target).info['categories_changed'] = True
+
+
+# drop the cached categories once the category changes are committed
+def _clear_categories_cache(session):
+
+    if session.info.pop('categories_changed', False):
+        _categories_dict.cache_clear()
+        _categories_etag.cache_clear()
+
+
+# forget the flag when the category changes are rolled back
+def _discard_categories_changed(session):
+
+    session.info.pop('categories_changed', None)
+
+
+event.listen(Category, 'after_insert', _flag_categories_changed)
+event.listen(Category, 'after_update', _flag_categories_changed)
+event.listen(Category, 'after_delete', _flag_categories_changed)
+event.listen(Session, 'after_commit', _clear_categories_cache)
+event.listen(Session, 'after_rollback', _discard_categories_changed)
+
+
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
     setup_db(app)
 
+    # Compress JSON responses of 500 bytes or more with brotli or gzip,
+    # whichever the client accepts, preferring brotli.
+    app.config['COMPRESS_MIMETYPES'] = ['application/json']
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    Compress(app)
+
     # Set up CORS. Allow ALL '*' for origins.
     CORS(app, resources={'/': {'origins': '*'}})
 
@@ -45,23 +125,40 @@ def create_app(test_config=None):
 
         return response
 
+    # Use the after_request decorator to answer conditional GETs
+    @app.after_request
+    def add_cache_headers(response):
+        '''
+        Sets ETag and Cache-Control so unchanged data returns 304.
+        '''
+        cache_control = CACHE_CONTROL.get(request.path)
+
+        if ((request.method != 'GET') or (cache_control is None)
+           or (response.status_code != 200)):
+            return response
+
+        # weak, since Flask-Compress may re-encode the body afterwards,
+        # and only computed if the endpoint did not set one already
+        response.headers['Cache-Control'] = cache_control
+        response.add_etag(weak=True)
+
+        return response.make_conditional(request)
+
     # Handles Get request for all '*' categories
     # or status code 500 for server error
     @app.route('/categories')
     def get_all_categories():
 
         try:
-            categories = Category.query.all()
-            # Format categories to match front-end
-            categories_dict = {}
-            for category in categories:
-                categories_dict[category.id] = category.type
+            response = json_response({
+                'success': True,
+                'categories': _categories_dict()
+                })
+            # add_cache_headers keeps this ETag instead of hashing the body
+            response.set_etag(_categories_etag(), weak=True)
 
             # return successful response
-            return jsonify({
-                'success': True,
-                'categories': categories_dict
-                }), 200
+            return response, 200
 
         except Exception:
             abort(500)
@@ -73,27 +170,20 @@ def create_app(test_config=None):
         including pagination every 10 questions.
         '''
 
-        # get paginated questions and categories
-        selection = Question.query.all()
-        total_questions = len(selection)
-
-        categories = Category.query.all()
-        categories_dict = {}
-        for category in categories:
-            categories_dict[category.id] = category.type
-
-        current_questions = paginate_questions(request, selection)
+        # get paginated questions
+        current_questions = paginate_questions(request, Question.query)
 
         # return 404 if there are no questions for the page numbers
         if (len(current_questions) == 0):
             abort(404)
 
         # return values if there are no errors
-        return jsonify({
+        return json_response({
             'success': True,
             'questions': current_questions,
-            'total_questions': total_questions,
-            'categories': categories_dict
+            'total_questions': db.session.query(
+                func.count(Question.id)).scalar(),
+            'categories': _categories_dict()
             }), 200
 
     @app.route('/questions/<int:id>', methods=['DELETE'])
@@ -104,18 +194,24 @@ def create_app(test_config=None):
         '''
 
         try:
-            # get the question by id
-            question = Question.query.get(id)
-            question.delete()
-
-            return jsonify({
-                'success': True,
-                'message': "Question successfully deleted!"
-                }), 200
-        except IndexError:
+            # delete the question by id without loading it first
+            deleted = Question.query.filter_by(id=id).delete(
+                synchronize_session=False)
+            db.session.commit()
+        except SQLAlchemyError:
             # abort if problem deleting question
+            db.session.rollback()
             abort(422)
 
+        # abort 404 if there was no question with that id
+        if (deleted == 0):
+            abort(404)
+
+        return json_response({
+            'success': True,
+            'message': "Question successfully deleted!"
+            }), 200
+
     @app.route('/questions', methods=['POST'])
     def create_question():
         '''
@@ -147,7 +243,7 @@ def create_app(test_config=None):
             question.insert()
 
             # return success message
-            return jsonify({
+            return json_response({
                 'success': True,
                 'message': 'Question successfully created!'
                 }), 201
@@ -155,16 +251,16 @@ def create_app(test_config=None):
         except IndexError:
             abort(422)
 
-    @app.route('/questions', methods=['POST'])
+    @app.route('/questions/search', methods=['POST'])
     def search_questions():
         '''
         Endpoint handles POST requests for
-        creating searching questions. Status code
+        searching questions. Status code
         422 is returned if any of the json data is
         empty.
         '''
 
-        data = reques.get_json()
+        data = request.get_json()
         search_term = data.get('searchTerm', '')
 
         # Return 422 status code if empty search term is sent
@@ -174,19 +270,20 @@ def create_app(test_config=None):
         try:
             # query the database using search term
             selection = Question.query.filter(Question.question.ilike
-                                              (f'%{search_term}%')).all()
+                                              (f'%{search_term}%'))
+
+            paginated = paginate_questions(request, selection)
 
             # 404 if no results found
-            if len(questions) == 0:
+            if len(paginated) == 0:
                 abort(404)
 
-            paginated = paginate_questions(request, selection)
-
             # return results
-            return jsonify({
+            return json_response({
                 'success': True,
                 'questions': paginated,
-                'total_questions': len(Question.query.all())
+                'total_questions': selection.with_entities(
+                    func.count(Question.id)).scalar()
                 }), 200
 
         except IndexError:
@@ -198,23 +295,24 @@ def create_app(test_config=None):
         Endpoint to get questions by category.
         '''
 
-        # Get the category by id.
-        category = Category.query.filter_by(id=id).one_or_none()
+        # Get the category by primary key, from the session if loaded.
+        category = Category.query.get(id)
 
         # abort 400 for bad request if category is not found
         if (category is None):
             abort(400)
 
-        selection = Question.query.filter_by(category=id).all()
+        selection = Question.query.filter_by(category=id)
 
         # paginate the selection
         paginated = paginate_questions(request, selection)
 
         # return the results
-        return jsonify({
+        return json_response({
             'success': True,
             'questions': paginated,
-            'total_questions': len(Question.query.all()),
+            'total_questions': selection.with_entities(
+                func.count(Question.id)).scalar(),
             'current_category': category.type
             }), 200
 
@@ -232,31 +330,30 @@ def create_app(test_config=None):
         if ((quiz_category is None) or (previous_questions is None)):
             abort(400)
 
-        # Load questions all questions if "ALL" is selected
+        # Load questions from all categories if "ALL" is selected
         if (quiz_category['id'] == 0):
-            questions = Question.query.all()
+            selection = Question.query
         else:
-            questions = Question.query.filter_by(
-             category=quiz_category['id']).all()
+            selection = Question.query.filter_by(category=quiz_category['id'])
 
-        # defines a random question generator method
-        def get_random_question():
-            return questions[random.randint(0, len(questions)-1)]
+        # leave out questions that have already been asked
+        previous_set = set(previous_questions)
+        if previous_set:
+            selection = selection.filter(Question.id.notin_(previous_set))
 
-        # get random question for the next question
-        next_question = get_random_question()
+        # let the database pick a random question for the next question,
+        # raiseload turns any accidental lazy load into an error
+        next_question = selection.options(raiseload('*')).order_by(
+            func.random()).first()
 
-        # defines boolean used to check that the question
-        # is not a previous question
-        found = True
-
-        while found:
-            if next_question.id in previous_questions:
-                next_question = get_random_question()
-            else:
-                found = False
+        # no question left to ask, the frontend ends the quiz
+        if (next_question is None):
+            return json_response({
+                'success': True,
+                'question': None
+                }), 200
 
-        return jsonify({
+        return json_response({
             'success': True,
             'question': next_question.format(),
             }), 200
@@ -264,7 +361,7 @@ def create_app(test_config=None):
     # Error handler for Bad request (400)
     @app.errorhandler(400)
     def bad_request(error):
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 400,
             'message': 'Bad request!'
@@ -273,7 +370,7 @@ def create_app(test_config=None):
     # Error handler for resource not found (404)
     @app.errorhandler(404)
     def not_found(error):
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 404,
             'message': 'Resource not found!'
@@ -282,7 +379,7 @@ def create_app(test_config=None):
     # Error handler for unprocesable entity (422)
     @app.errorhandler(422)
     def unprocesable_entity(error):
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 422,
             'message': 'Unprocessable entity!'
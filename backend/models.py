@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, Index, DDL, create_engine, event
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -17,6 +17,13 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # keep warm connections around instead of connecting per request
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": 20,
+        "max_overflow": 40,
+        "pool_pre_ping": True,
+        "pool_recycle": 300
+    }
     db.app = app
     db.init_app(app)
     db.create_all()
@@ -27,6 +34,13 @@ Question
 '''
 class Question(db.Model):
   __tablename__ = 'questions'
+  __table_args__ = (
+    # trigram index so ILIKE '%term%' searches don't scan the whole table
+    Index('questions_question_trgm', 'question', postgresql_using='gin',
+          postgresql_ops={'question': 'gin_trgm_ops'}),
+    # category listings filter by category and paginate ordered by id
+    Index('ix_questions_category', 'category', 'id'),
+  )
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
@@ -60,6 +74,11 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+# gin_trgm_ops is provided by the pg_trgm extension, postgres only
+event.listen(Question.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(
+               dialect='postgresql'))
+
 '''
 Category
 
@@ -55,6 +55,44 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['total_questions'])
         self.assertTrue(len(data['questions']))
 
+    def test_304_if_categories_unchanged(self):
+        '''
+        Tests conditional GET of categories with an ETag.
+        '''
+
+        # get the categories once to learn their ETag
+        response = self.client().get('/categories')
+        etag = response.headers.get('ETag')
+
+        # check that the response can be cached
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(etag)
+
+        # request again with the ETag
+        response = self.client().get('/categories',
+                                     headers={'If-None-Match': etag})
+
+        # check that nothing is sent back for unchanged data
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def test_compressed_questions(self):
+        '''
+        Tests compression of questions for each accepted encoding.
+        '''
+
+        for encoding in ['br', 'gzip']:
+            # request questions accepting only one encoding
+            response = self.client().get('/questions',
+                                         headers={'Accept-Encoding':
+                                                  encoding})
+
+            # check that the response is compressed with that encoding
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers.get('Content-Encoding'),
+                             encoding)
+            self.assertIn('Accept-Encoding', response.headers.get('Vary'))
+
     def test_404_error(self):
         '''
         Test for out of bound page.
@@ -109,6 +147,20 @@ class TriviaTestCase(unittest.TestCase):
         # check if question equals None after delete
         self.assertEqual(question, None)
 
+    def test_404_if_question_does_not_exist(self):
+        '''
+        Tests question deletion failure 404.
+        '''
+
+        # delete a question that does not exist
+        response = self.client().delete('/questions/1000')
+        data = json.loads(response.data)
+
+        # check status code and message
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'Resource not found!')
+
     def test_create_questions(self):
         '''
         Test for creating question.
@@ -152,7 +204,7 @@ class TriviaTestCase(unittest.TestCase):
          '''
 
          # send post request with search term
-         response = self.client().post('/questions',
+         response = self.client().post('/questions/search',
                                        json={'searchTerm':
                                        'La Giaconda is better known as what?'})
 
@@ -160,14 +212,15 @@ class TriviaTestCase(unittest.TestCase):
          data = json.loads(response.data)
 
          # check response status code and message
-         self.assertEqual(response.status_code, 422)
-         self.assertEqual(data['success'], False)
+         self.assertEqual(response.status_code, 200)
+         self.assertEqual(data['success'], True)
 
          # check that number of results = 1
-         # self.assertEqual(len(data['questions']), 1)
+         self.assertEqual(len(data['questions']), 1)
+         self.assertEqual(data['total_questions'], 1)
 
          # check that id of question in response is correct
-         # self.assertEqual(data['questions'][0]['id'], 23)
+         self.assertEqual(data['questions'][0]['id'], 17)
 
     def test_404_if_search_questions_fails(self):
          '''
@@ -175,16 +228,16 @@ class TriviaTestCase(unittest.TestCase):
          '''
 
          # send post request with search term that should fail
-         response = self.client().post('/questions',
+         response = self.client().post('/questions/search',
                                        json={'searchTerm': 'Chad'})
 
          # load response data
          data = json.loads(response.data)
 
          # check response status code and message
-         self.assertEqual(response.status_code, 422)
+         self.assertEqual(response.status_code, 404)
          self.assertEqual(data['success'], False)
-         self.assertEqual(data['message'], 'Unprocessable entity!')
+         self.assertEqual(data['message'], 'Resource not found!')
 
     def test_get_questions_by_category(self):
          '''
@@ -204,6 +257,10 @@ class TriviaTestCase(unittest.TestCase):
          # check that questions are returned (len != 0)
          self.assertNotEqual(len(data['questions']), 0)
 
+         # check that total_questions counts only this category
+         self.assertEqual(data['total_questions'],
+                          Question.query.filter_by(category=1).count())
+
          # check that current category returned is science
          self.assertEqual(data['current_category'], 'Science')
 